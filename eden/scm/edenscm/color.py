@@ -13,7 +13,8 @@
 from __future__ import absolute_import
 
 import re
-from typing import Dict, List, Optional, Pattern, Union
+import sys
+from typing import Dict, Optional, Pattern, Tuple, Union
 
 import bindings
 
@@ -21,7 +22,6 @@ from . import encoding, pycompat, util
 from .i18n import _
 from .pycompat import decodeutf8, encodeutf8
 
-
 try:
     import curses
 
@@ -56,6 +56,18 @@ _defaulteffects = {
 }
 _effects: Dict[str, int] = {}
 
+# bumped by configstyles(), which may rebuild the tables below
+_generation = 0
+
+# effect name -> SGR parameter string, see _effectcode()
+_effectcodes: Dict[str, str] = {}
+
+# effects string -> (start, stop, stop + "\n" + start), see _effectsequences()
+_sequences: Dict[str, Tuple[str, str, str]] = {}
+
+# effects string -> _sequences entry encoded for byte output
+_bytesequences: Dict[str, Tuple[bytes, bytes, bytes]] = {}
+
 _defaultstyles = {
     "grep.match": "red bold",
     "grep.linenumber": "green",
@@ -221,14 +233,19 @@ def _extendcolors(colors) -> None:
     if colors >= 256:
         for i in range(256):
             # pyre-fixme[6]: For 2nd param expected `int` but got `str`.
-            _effects["color%s" % i] = "38;5;%s" % i
+            _effects[sys.intern("color%s" % i)] = "38;5;%s" % i
             # pyre-fixme[6]: For 2nd param expected `int` but got `str`.
-            _effects["color%s_background" % i] = "48;5;%s" % i
+            _effects[sys.intern("color%s_background" % i)] = "48;5;%s" % i
     if colors >= 16777216:
         _effects = truecoloreffects(_effects)
 
 
 def configstyles(ui) -> None:
+    global _generation
+    _generation += 1
+    _effectcodes.clear()
+    _sequences.clear()
+    _bytesequences.clear()
     if ui._colormode == "ansi":
         _extendcolors(supportedcolors(ui))
     ui._styles.update(_defaultstyles)
@@ -250,7 +267,21 @@ def configstyles(ui) -> None:
                         )
                         % (e, status)
                     )
-            ui._styles[status] = " ".join(good)
+            ui._styles[status] = sys.intern(" ".join(good))
+    if ui._colormode == "ansi" and not ui.configbool("color", "use-rust", default=True):
+        _precomputesequences(ui)
+
+
+def _precomputesequences(ui) -> None:
+    """Build the control sequences of every configured style up front
+
+    Rendering a single known label then only takes dictionary lookups.
+    """
+    for effects in set(ui._styles.values()):
+        if ":" in effects:
+            effects = normalizestyle(ui, effects)
+        if effects and all(valideffect(ui, e) for e in effects.split()):
+            _effectsequences(ui, sys.intern(effects))
 
 
 def _activeeffects(ui):
@@ -262,9 +293,11 @@ def _activeeffects(ui):
 
 def valideffect(ui, effect) -> bool:
     "Determine if the effect is valid or not."
+    activeeffects = _activeeffects(ui)
+    truecolor = isinstance(activeeffects, truecoloreffects)
+    truecolormatch = _truecolorre.match
     return all(
-        (isinstance(_activeeffects(ui), truecoloreffects) and _truecolorre.match(e))
-        or (e in _activeeffects(ui))
+        (truecolor and truecolormatch(e)) or (e in activeeffects)
         for e in effect.split("+")
     )
 
@@ -280,35 +313,103 @@ def _mergeeffects(
     >>> s = _mergeeffects('red' + s, '[R]', '|')
     >>> s
     '[R]red[M]ma[Y][C]cyan|[R][M][Y]yellow|[R][M]genta|'
+
+    The start sequence is left out where a piece already starts with a
+    reset, and so is the stop sequence before such a piece, as they would
+    have no visible effect:
+
+    >>> _mergeeffects('\\x1b[0;33my\\x1b[0mb', '\\x1b[0;31m', '\\x1b[0m')
+    '\\x1b[0;33my\\x1b[0;31mb\\x1b[0m'
     """
     parts = []
     if usebytes:
         assert isinstance(text, bytes)
-        for t in text.split(encodeutf8(stop)):
+        start = encodeutf8(start)
+        stop = encodeutf8(stop)
+        for t in text.split(stop):
             if not t:
                 continue
-            parts.extend([encodeutf8(start), t, encodeutf8(stop)])
+            if not _isresetled(t, usebytes=True):
+                t = start + t
+            if parts and _isresetled(t, usebytes=True):
+                parts.pop()
+            parts.extend([t, stop])
         return b"".join(parts)
     else:
         assert isinstance(text, str)
         for t in text.split(stop):
             if not t:
                 continue
-            parts.extend([start, t, stop])
+            if not _isresetled(t):
+                t = start + t
+            if parts and _isresetled(t):
+                parts.pop()
+            parts.extend([t, stop])
         return "".join(parts)
 
 
-def _render_effects(ui, text, effects: List[str], usebytes: bool = False):
-    "Wrap text in commands to turn on each effect."
+def _effectcode(activeeffects, name: str) -> str:
+    """Return the SGR parameter string for a single effect name"""
+    code = _effectcodes.get(name)
+    if code is None:
+        code = _effectcodes[name] = pycompat.bytestr(activeeffects[name])
+    return code
+
+
+def _effectsequences(ui, effects: str) -> Tuple[str, str, str]:
+    """Return the (start, stop, linebreak) control sequences for effects
+
+    linebreak is what a newline turns into inside styled text.
+    """
+    sequences = _sequences.get(effects)
+    if sequences is None:
+        activeeffects = _activeeffects(ui)
+        names = ["none"] + [e for effect in effects.split() for e in effect.split("+")]
+        start = [_effectcode(activeeffects, e) for e in names]
+        start = "\033[" + ";".join(start) + "m"
+        stop = "\033[" + _effectcode(activeeffects, "none") + "m"
+        sequences = _sequences[effects] = (start, stop, stop + "\n" + start)
+    return sequences
+
+
+def _effectbytesequences(ui, effects: str) -> Tuple[bytes, bytes, bytes]:
+    """Like _effectsequences, but encoded for byte output"""
+    sequences = _bytesequences.get(effects)
+    if sequences is None:
+        start, stop, linebreak = _effectsequences(ui, effects)
+        sequences = _bytesequences[effects] = (
+            start.encode("ascii"),
+            stop.encode("ascii"),
+            linebreak.encode("ascii"),
+        )
+    return sequences
+
+
+def _render_effects(ui, text, effects: str, usebytes: bool = False):
+    "Wrap each line of text in commands to turn on each effect."
     if not text:
         return text
-    activeeffects = _activeeffects(ui)
-    # pyre-fixme[16]: `List` has no attribute `split`.
-    effects = ["none"] + [e for effect in effects.split() for e in effect.split("+")]
-    start = [pycompat.bytestr(activeeffects[e]) for e in effects]
-    start = "\033[" + ";".join(start) + "m"
-    stop = "\033[" + pycompat.bytestr(activeeffects["none"]) + "m"
-    return _mergeeffects(text, start, stop, usebytes=usebytes)
+    if usebytes:
+        assert isinstance(text, bytes)
+        if b"\033" in text:
+            start, stop, linebreak = _effectsequences(ui, effects)
+            return b"\n".join(
+                _mergeeffects(line, start, stop, usebytes=True)
+                for line in text.split(b"\n")
+            )
+        start, stop, linebreak = _effectbytesequences(ui, effects)
+        # Wrap all lines at once, then unwrap the empty ones.
+        text = start + text.replace(b"\n", linebreak) + stop
+        return text.replace(start + stop, b"")
+    else:
+        assert isinstance(text, str)
+        start, stop, linebreak = _effectsequences(ui, effects)
+        if "\033" in text:
+            return "\n".join(
+                _mergeeffects(line, start, stop) for line in text.split("\n")
+            )
+        text = start + text.replace("\n", linebreak) + stop
+        return text.replace(start + stop, "")
 
 
 _ansieffectre: Pattern[str] = re.compile(r"\x1b\[[0-9;]*m")
@@ -317,13 +418,17 @@ _truecolorre: Pattern[str] = re.compile(r"#([0-9A-Fa-f]{3}){1,2}(_background)?")
 
 def stripeffects(text):
     """Strip ANSI control codes which could be inserted by colorlabel()"""
+    if "\x1b" not in text:
+        return text
     return _ansieffectre.sub("", text)
 
 
 def colorlabel(ui, msg, label, usebytes: bool = False) -> Union[bytes, str]:
     """add color control code according to the mode"""
+    if not msg:
+        return msg
     if ui._colormode == "debug":
-        if label and msg:
+        if label:
             if msg[-1] == "\n":
                 if usebytes:
                     msg = b"[%s|%s]\n" % (encodeutf8(label), msg[:-1])
@@ -336,48 +441,134 @@ def colorlabel(ui, msg, label, usebytes: bool = False) -> Union[bytes, str]:
                     msg = "[%s|%s]" % (label, msg)
     elif ui._colormode is not None:
         if ui.configbool("color", "use-rust", default=True):
-            if not ui._styler:
-                ui._styler = bindings.io.styler(supportedcolors(ui))
-
-            style = " ".join(ui._styles.get(l, l) for l in label.split())
-            if not usebytes:
-                # Roundtrip strings to clear out non-utf8 characters.
-                msg = encodeutf8(msg, errors="backslashreplace")
-
-            msg = decodeutf8(msg, errors="backslashreplace")
-            styled = ui._styler.renderbytes(style, msg)
-            if not usebytes:
-                styled = styled.decode()
-            return styled
-
-        effects = []
-        for l in label.split():
-            s = ui._styles.get(l, "")
-            if ":" in s:
-                s = normalizestyle(ui, s)
-            if s:
-                effects.append(s)
-            elif valideffect(ui, l):
-                effects.append(l)
-        effects = " ".join(effects)
+            return _rustcolorlabel(ui, msg, _ruststyle(ui, label), usebytes)
+
+        effects = _cachedeffects(ui, label)
         if effects:
-            if usebytes:
-                msg = b"\n".join(
-                    [
-                        # pyre-fixme[6]: For 3rd param expected `List[str]` but got
-                        #  `str`.
-                        _render_effects(ui, line, effects, usebytes=True)
-                        for line in msg.split(b"\n")
-                    ]
-                )
-            else:
-                msg = "\n".join(
-                    # pyre-fixme[6]: For 3rd param expected `List[str]` but got `str`.
-                    [_render_effects(ui, line, effects) for line in msg.split("\n")]
-                )
+            msg = _render_effects(ui, msg, effects, usebytes=usebytes)
     return msg
 
 
+def _ruststyle(ui, label: str) -> str:
+    """Return the style passed to the Rust styler for a label"""
+    return " ".join(ui._styles.get(l, l) for l in label.split())
+
+
+def _rustcolorlabel(ui, msg, style: str, usebytes: bool) -> Union[bytes, str]:
+    """style a non-empty msg with the Rust styler"""
+    if not usebytes:
+        # Roundtrip strings to clear out non-utf8 characters.
+        msg = encodeutf8(msg, errors="backslashreplace")
+
+    msg = decodeutf8(msg, errors="backslashreplace")
+    if not style:
+        # The styler passes unstyled text through unchanged.
+        return encodeutf8(msg) if usebytes else msg
+
+    if not ui._styler:
+        ui._styler = bindings.io.styler(supportedcolors(ui))
+    styled = ui._styler.renderbytes(style, msg)
+    if not usebytes:
+        styled = styled.decode()
+    return styled
+
+
+def _cachedeffects(ui, label: str) -> str:
+    """Return the effects string for a label, using the ui's cache
+
+    The cache is dropped once configstyles() has run on any ui since it was
+    filled, because that rebuilds the module-level effect tables.
+    """
+    if ui._labeleffectsgeneration != _generation:
+        ui._labeleffects.clear()
+        ui._labeleffectsgeneration = _generation
+    effects = ui._labeleffects.get(label)
+    if effects is None:
+        effects = _resolvelabel(ui, label)
+    return effects
+
+
+def _resolvelabel(ui, label: str) -> str:
+    """Return the effects string for a label and cache it on the ui"""
+    effects = []
+    for l in label.split():
+        s = ui._styles.get(l, "")
+        if ":" in s:
+            s = normalizestyle(ui, s)
+        if s:
+            effects.append(s)
+        elif valideffect(ui, l):
+            effects.append(l)
+    # Interned so _sequences lookups can succeed on identity.
+    effects = ui._labeleffects[label] = sys.intern(" ".join(effects))
+    return effects
+
+
+def _warmlabelcache(ui, labels) -> None:
+    """Resolve labels and their control sequences before rendering them"""
+    if ui._colormode != "ansi" or ui.configbool("color", "use-rust", default=True):
+        return
+    for label in labels:
+        effects = _cachedeffects(ui, label)
+        if effects:
+            _effectsequences(ui, effects)
+
+
+def colorlabels(ui, msgs, label: str, usebytes: bool = False) -> Union[bytes, str]:
+    """add color control codes to messages sharing a label
+
+    Return the concatenation of the labeled messages. With the Python ANSI
+    renderer, the messages are styled as a single message.
+    """
+    empty = b"" if usebytes else ""
+    if ui._colormode == "debug":
+        return empty.join(
+            [colorlabel(ui, msg, label, usebytes=usebytes) for msg in msgs]
+        )
+    if ui.configbool("color", "use-rust", default=True):
+        # The Rust styler writes already styled text verbatim, so its stop
+        # sequence would end an enclosing style early if such a message was
+        # merged with its neighbours.
+        style = _ruststyle(ui, label)
+        return empty.join(
+            [_rustcolorlabel(ui, msg, style, usebytes) for msg in msgs if msg]
+        )
+
+    # _mergeeffects re-applies the style after every nested stop sequence,
+    # so the joined messages render the same as separate ones.
+    msg = empty.join(msgs)
+    effects = _cachedeffects(ui, label)
+    if msg and effects:
+        msg = _render_effects(ui, msg, effects, usebytes=usebytes)
+    return msg
+
+
+def _isresetled(text: "Union[str, bytes]", usebytes: bool = False) -> bool:
+    """Check whether text starts with an SGR sequence beginning with a reset
+
+    >>> _isresetled('\\x1b[0;31mred'), _isresetled('\\x1b[0mplain')
+    (True, True)
+    >>> _isresetled('\\x1b[31mred'), _isresetled('\\x1b[0;3x'), _isresetled('x')
+    (False, False, False)
+    >>> _isresetled(b'\\x1b[0;1mbold', usebytes=True)
+    True
+    """
+    if usebytes:
+        assert isinstance(text, bytes)
+        end = text.find(b"m")
+        if not text.startswith(b"\033[0") or end < 0:
+            return False
+        params = text[2:end]
+        return params.split(b";")[0] == b"0" and params.replace(b";", b"").isdigit()
+    else:
+        assert isinstance(text, str)
+        end = text.find("m")
+        if not text.startswith("\033[0") or end < 0:
+            return False
+        params = text[2:end]
+        return params.split(";")[0] == "0" and params.replace(";", "").isdigit()
+
+
 def supportedcolors(ui):
     """Return the number of colors likely supported by the terminal
 
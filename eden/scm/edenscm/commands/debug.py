@@ -770,6 +770,7 @@ def _debugdisplaycolor(ui) -> None:
     ui._styles.clear()
     for effect in color._activeeffects(ui).keys():
         ui._styles[effect] = effect
+    color._warmlabelcache(ui, ui._styles)
     ui.write(_("available colors:\n"))
     # sort label with a '_' after the other to group '_background' entry.
     items = sorted(ui._styles.items(), key=lambda i: ("_" in i[0], i[0], i[1]))
@@ -782,6 +783,7 @@ def _debugdisplaystyle(ui) -> None:
     if not ui._styles:
         return
     width = max(len(s) for s in ui._styles)
+    color._warmlabelcache(ui, ui._styles)
     for label, effects in sorted(ui._styles.items()):
         ui.write("%s" % label, label=label)
         if effects:
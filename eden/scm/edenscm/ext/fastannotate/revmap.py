@@ -160,72 +160,67 @@ class revmap(object):
         """write the state down to the file"""
         if not self.path:
             return
+        # serialize everything first so the file is written in one call
         if self._lastmaxrev == -1:  # write the entire file
-            with open(self.path, "wb") as f:
-                f.write(self.HEADER)
-                for i in range(1, len(self._rev2hsh)):
-                    self._writerev(i, f)
+            mode = "wb"
+            buf = [self.HEADER]
+            start = 1
         else:  # append incrementally
-            with open(self.path, "ab") as f:
-                for i in range(self._lastmaxrev + 1, len(self._rev2hsh)):
-                    self._writerev(i, f)
+            mode = "ab"
+            buf = []
+            start = self._lastmaxrev + 1
+        buf.extend(self._revdata(i) for i in range(start, len(self._rev2hsh)))
+        with open(self.path, mode) as f:
+            f.write(b"".join(buf))
         self._lastmaxrev = self.maxrev
 
     def _load(self):
         """load state from file"""
         if not self.path:
             return
+        # read the whole file and parse it from memory, instead of issuing
+        # small reads for every revision.
+        with open(self.path, "rb") as f:
+            data = f.read()
         # use local variables in a loop. CPython uses LOAD_FAST for them,
         # which is faster than both LOAD_CONST and LOAD_GLOBAL.
-        flaglen = 1
         hshlen = _hshlen
-        with open(self.path, "rb") as f:
-            if f.read(len(self.HEADER)) != self.HEADER:
-                raise error.CorruptedFileError()
-            self.clear(flush=False)
-            while True:
-                buf = f.read(flaglen)
-                if not buf:
-                    break
-                flag = ord(buf)
-                rev = len(self._rev2hsh)
-                if flag & renameflag:
-                    path = self._readcstr(f)
-                    self._renamerevs.append(rev)
-                    self._renamepaths.append(pycompat.decodeutf8(path))
-                hsh = f.read(hshlen)
-                if len(hsh) != hshlen:
+        pos = len(self.HEADER)
+        end = len(data)
+        if data[:pos] != self.HEADER:
+            raise error.CorruptedFileError()
+        self.clear(flush=False)
+        while pos < end:
+            flag = data[pos]
+            pos += 1
+            rev = len(self._rev2hsh)
+            if flag & renameflag:
+                pathend = data.find(b"\0", pos)
+                if pathend < 0:  # unexpected eof
                     raise error.CorruptedFileError()
-                self._hsh2rev[hsh] = rev
-                self._rev2flag.append(flag)
-                self._rev2hsh.append(hsh)
+                self._renamerevs.append(rev)
+                self._renamepaths.append(pycompat.decodeutf8(data[pos:pathend]))
+                pos = pathend + 1
+            hsh = data[pos : pos + hshlen]
+            if len(hsh) != hshlen:
+                raise error.CorruptedFileError()
+            pos += hshlen
+            self._hsh2rev[hsh] = rev
+            self._rev2flag.append(flag)
+            self._rev2hsh.append(hsh)
         self._lastmaxrev = self.maxrev
 
-    def _writerev(self, rev, f):
-        """append a revision data to file"""
+    def _revdata(self, rev):
+        """return the file data of a revision"""
         flag = self._rev2flag[rev]
         hsh = self._rev2hsh[rev]
-        f.write(struct.pack("B", flag))
         if flag & renameflag:
             path = self.rev2path(rev)
             if path is None:
                 raise error.CorruptedFileError("cannot find path for %s" % rev)
             path = pycompat.encodeutf8(path)
-            f.write(path + b"\0")
-        f.write(hsh)
-
-    @staticmethod
-    def _readcstr(f):
-        """read a C-language-like '\0'-terminated string"""
-        buf = b""
-        while True:
-            ch = f.read(1)
-            if not ch:  # unexpected eof
-                raise error.CorruptedFileError()
-            if ch == b"\0":
-                break
-            buf += ch
-        return buf
+            return struct.pack("B", flag) + path + b"\0" + hsh
+        return struct.pack("B", flag) + hsh
 
     def __contains__(self, f):
         """(fctx or (node, path)) -> bool.
@@ -92,10 +92,11 @@ def getlocalpackpath(base, category):
 def getallcachepaths(ui):
     cachepath = getcachepath(ui)
 
-    for name in os.listdir(cachepath):
-        path = os.path.join(cachepath, name)
-        if os.path.isdir(path):
-            yield path
+    # scandir reports the entry type without a stat() per entry
+    with os.scandir(cachepath) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                yield entry.path
 
 
 def createrevlogtext(text, copyfrom=None, copyrev=None):
@@ -3068,11 +3068,12 @@ class localrepository(object):
     def branches(self, nodes):
         if not nodes:
             nodes = [self.changelog.tip()]
+        parents = self.changelog.parents
         b = []
         for n in nodes:
             t = n
             while True:
-                p = self.changelog.parents(n)
+                p = parents(n)
                 if p[1] != nullid or p[0] == nullid:
                     b.append((t, n, p[0], p[1]))
                     break
@@ -3081,13 +3082,15 @@ class localrepository(object):
 
     def between(self, pairs):
         r = []
+        # resolve the changelog once, the walks below can be long
+        parents = self.changelog.parents
 
         for top, bottom in pairs:
             n, l, i = top, [], 0
             f = 1
 
             while n != bottom and n != nullid:
-                p = self.changelog.parents(n)[0]
+                p = parents(n)[0]
                 if i == f:
                     l.append(n)
                     f = f * 2
@@ -1802,8 +1802,13 @@ def _buildmatch(ctx, kindpats, globsuffix, root):
     subincludes, kindpats = _expandsubinclude(kindpats, root)
     if subincludes:
         submatchers = {}
+        # Reject files outside of all subinclude directories with a single
+        # startswith() call instead of testing each prefix in Python.
+        prefixes = tuple(prefix for prefix, matcherargs in subincludes)
 
         def matchsubinclude(f):
+            if not f.startswith(prefixes):
+                return False
             for prefix, matcherargs in subincludes:
                 if f.startswith(prefix):
                     mf = submatchers.get(prefix)
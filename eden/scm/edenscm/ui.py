@@ -178,6 +178,11 @@ class ui(object):
         self._colormode = None
         self._styler = None
         self._styles = {}
+        # label -> effects cache for color.colorlabel, valid while
+        # _labeleffectsgeneration matches color._generation. Not copied from
+        # src, as the copy's _styles may be changed independently.
+        self._labeleffects = {}
+        self._labeleffectsgeneration = None
         # Whether the output stream is known to be a terminal.
         self._terminaloutput = None
         # The current command name being executed.
@@ -700,9 +705,9 @@ class ui(object):
                     )
                 msgs.extend((itemvalue, " "))
         msgs.extend(args)
-        if addlabels:
+        if addlabels and self._colormode is not None:
             label = opts.get(r"label", "")
-            msgs = [self.label(m, label, usebytes=usebytes) for m in msgs]
+            msgs = [color.colorlabels(self, msgs, label, usebytes=usebytes)]
         return msgs
 
     def write(self, *args: str, **opts: "Any") -> None:
@@ -48,3 +48,85 @@ Don't crash on invalid utf-8:
 
   $ hg testcolor --config color.test.test=blue --config alias.testcolor="debugtemplate '{label(\"test.test\", \"\x96\x96\n\")}'"
   [34m\udc96\udc96[39m
+
+Messages already styled by a prefix or a nested label keep the label of the
+whole write around them:
+
+  $ newext colorwrite <<EOF
+  > from edenscm import registrar
+  > cmdtable = {}
+  > command = registrar.command(cmdtable)
+  > @command("colorwrite", [], norepo=True)
+  > def colorwrite(ui):
+  >     ui.warn("careful\n", notice="warning")
+  >     ui.write(ui.label("in", "test.inner"), " out\n", label="test.test")
+  > EOF
+  $ setconfig color.ui.warning=red color.ui.prefix.notice=yellow
+  $ setconfig color.test.test=blue color.test.inner=green
+
+  $ hg colorwrite
+  \x1b[31m\x1b[33mwarning:\x1b[39m\x1b[39m\x1b[31m \x1b[39m\x1b[31mcareful\x1b[39m (esc)
+  \x1b[34m\x1b[32min\x1b[39m\x1b[39m\x1b[34m out\x1b[39m (esc)
+
+The same with the Python renderer:
+
+  $ setconfig color.use-rust=false
+  $ export HGCOLORS=8
+
+  $ hg colorwrite
+  \x1b[0;33mwarning:\x1b[0;31m careful\x1b[0m (esc)
+  \x1b[0;32min\x1b[0;34m out\x1b[0m (esc)
+
+Multi-line messages, empty lines, writes of several arguments and bytes:
+
+  $ newext colorlines <<EOF
+  > from edenscm import registrar
+  > cmdtable = {}
+  > command = registrar.command(cmdtable)
+  > @command("colorlines", [], norepo=True)
+  > def colorlines(ui):
+  >     ui.write("one\n\ntwo\n", label="test.test")
+  >     ui.write("a", "b", "\n", label="test.test")
+  >     ui.write("\n", label="test.test")
+  >     ui.writebytes(b"bytes\n", label="test.test")
+  >     ui.writebytes(b"raw \x1b[0m\x1b[0;1m kept\n")
+  > EOF
+
+  $ hg colorlines
+  \x1b[0;34mone\x1b[0m (esc)
+  
+  \x1b[0;34mtwo\x1b[0m (esc)
+  \x1b[0;34mab\x1b[0m (esc)
+  
+  \x1b[0;34mbytes\x1b[0m (esc)
+  raw \x1b[0m\x1b[0;1m kept (esc)
+
+  $ hg debugcolor
+  color mode: ansi
+  available colors:
+  \x1b[0;30mblack\x1b[0m (esc)
+  \x1b[0;34mblue\x1b[0m (esc)
+  \x1b[0;1mbold\x1b[0m (esc)
+  \x1b[0;36mcyan\x1b[0m (esc)
+  \x1b[0;2mdim\x1b[0m (esc)
+  \x1b[0;32mgreen\x1b[0m (esc)
+  \x1b[0;7minverse\x1b[0m (esc)
+  \x1b[0;3mitalic\x1b[0m (esc)
+  \x1b[0;35mmagenta\x1b[0m (esc)
+  \x1b[0;0mnone\x1b[0m (esc)
+  \x1b[0;31mred\x1b[0m (esc)
+  \x1b[0;4munderline\x1b[0m (esc)
+  \x1b[0;37mwhite\x1b[0m (esc)
+  \x1b[0;33myellow\x1b[0m (esc)
+  \x1b[0;40mblack_background\x1b[0m (esc)
+  \x1b[0;44mblue_background\x1b[0m (esc)
+  \x1b[0;46mcyan_background\x1b[0m (esc)
+  \x1b[0;42mgreen_background\x1b[0m (esc)
+  \x1b[0;45mpurple_background\x1b[0m (esc)
+  \x1b[0;41mred_background\x1b[0m (esc)
+  \x1b[0;47mwhite_background\x1b[0m (esc)
+  \x1b[0;43myellow_background\x1b[0m (esc)
+
+  $ hg debugcolor --style | grep 'test\.' | sed 's/: */: /'
+  \x1b[0;32mtest.inner\x1b[0m: \x1b[0;32mgreen\x1b[0m (esc)
+  \x1b[0;34mtest.test\x1b[0m: \x1b[0;34mblue\x1b[0m (esc)
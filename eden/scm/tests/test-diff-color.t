@@ -49,6 +49,22 @@ default context
    a
    c
 
+(the same with the Python renderer)
+
+  $ HGCOLORS=8 hg diff --nodates --config color.use-rust=false
+  \x1b[0;1mdiff -r cf9f4ba66af2 a\x1b[0m (esc)
+  \x1b[0;31;1m--- a/a\x1b[0m (esc)
+  \x1b[0;32;1m+++ b/a\x1b[0m (esc)
+  \x1b[0;35m@@ -2,7 +2,7 @@\x1b[0m (esc)
+   c
+   a
+   a
+  \x1b[0;31m-b\x1b[0m (esc)
+  \x1b[0;32m+dd\x1b[0m (esc)
+   a
+   a
+   c
+
 (check that 'ui.color=yes' match '--color=auto')
 
   $ hg diff --nodates --config ui.color=yes
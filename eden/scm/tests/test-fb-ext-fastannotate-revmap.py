@@ -11,11 +11,6 @@ import tempfile
 from edenscm import pycompat
 
 from edenscm.ext.fastannotate import error, revmap
-from hghave import require
-
-
-require(["py2"])
-
 
 try:
     xrange(0)
@@ -140,6 +135,52 @@ def testcorruptformat():
     os.unlink(path)
 
 
+def testtruncated():
+    path = gettemppath()
+    rm = revmap.revmap(path)
+    rm.append(genhsh(1), path="a/b")
+    rm.append(genhsh(2), sidebranch=True, path="a/c", flush=True)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    def truncate(size):
+        with open(path, "wb") as f:
+            f.write(data[:size])
+
+    # truncated inside a rename path, the terminating NUL is missing
+    truncate(data.index(b"a/c") + 2)
+    try:
+        revmap.revmap(path)
+        ensure(False)
+    except error.CorruptedFileError:
+        pass
+
+    # truncated inside a hash
+    truncate(len(data) - 1)
+    try:
+        revmap.revmap(path)
+        ensure(False)
+    except error.CorruptedFileError:
+        pass
+
+    # only files ending at a revision boundary are valid
+    rev1end = data.index(b"a/c") - 1
+    boundaries = {len(revmap.revmap.HEADER): 0, rev1end: 1, len(data): 2}
+    for size in xrange(len(data) + 1):
+        truncate(size)
+        try:
+            rm = revmap.revmap(path)
+        except error.CorruptedFileError:
+            ensure(size not in boundaries)
+        else:
+            ensure(rm.maxrev == boundaries[size])
+            for i in xrange(1, rm.maxrev + 1):
+                ensure(rm.rev2hsh(i) == genhsh(i))
+                ensure(rm.rev2path(i) == ["a/b", "a/c"][i - 1])
+
+    os.unlink(path)
+
+
 def testcopyfrom():
     path = gettemppath()
     rm = revmap.revmap(path)
@@ -155,7 +196,7 @@ def testcopyfrom():
     rm2.flush()
 
     # two files should be the same
-    ensure(len(set(open(p).read() for p in [path, path2])) == 1)
+    ensure(len(set(open(p, "rb").read() for p in [path, path2])) == 1)
 
     os.unlink(path)
     os.unlink(path2)
@@ -211,6 +252,7 @@ def testlastnode():
 
 testbasicreadwrite()
 testcorruptformat()
+testtruncated()
 testcopyfrom()
 testcontains()
 testlastnode()